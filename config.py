@@ -1,13 +1,20 @@
 LATEST = 701
 BATCH_SIZE = 100
+SINGLE_VOLUME = False  # one PDF with all days instead of BATCH_SIZE splits, streamed to disk to keep memory flat
 CREATE_COVER = False
 INCLUDE_VIDEO = False
 INCLUDE_DESCRIPTION = False
 EXCLUDE_IMAGES = False
 INCLUDE_DESCRIPTION_IMAGE = False
 INCLUDE_DESCRIPTION_IMAGE_GRID = False
+WATCH = False
+WATCH_INTERVAL = 600  # secs between polls for the next day in watch mode
+BASEPAINT_API_URL = "https://basepaint.xyz/api"  # point both URLs to a local stand-in to test watch mode
+BASEPAINT_ANIMATIONS_URL = "https://basepaint.net/animations"
 ARCHIVE_VERSION = "0.3.1"
 GOOGLE_API_KEY = "Replace with a valid Gemini API key in your GitHub repo secrets or locally"
 GEMINI_MODEL = "gemini-2.5-pro"  #  [m.name for m in genai.list_models()] to check other available models
 GEMINI_SLEEP = [10, 55]  # avoid exceeding 10 RPM quota https://ai.google.dev/gemini-api/docs/rate-limits
+GEMINI_BATCH_SIZE = 1  # images per request, >1 packs several reduced images (and titles) into each one
+GEMINI_BATCH_IMAGE_SIZE = 512  # px, images sent in batches are scaled down to this size
 # Gemini usage metrics available at https://aistudio.google.com/app/usage
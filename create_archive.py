@@ -1,11 +1,20 @@
-from argparse import ArgumentParser
+from argparse import ArgumentParser, ArgumentTypeError
 
 from fetch_files import fetch_files
 from fetch_metadata import create_metadata_csv
 from enrich_metadata import enrich_metadata_csv
 from image_to_pdf import create_pdf
 from image_descriptions import create_reduced_images, create_description_csv
-from config import LATEST, BATCH_SIZE, CREATE_COVER, INCLUDE_VIDEO, INCLUDE_DESCRIPTION, EXCLUDE_IMAGES, INCLUDE_DESCRIPTION_IMAGE, INCLUDE_DESCRIPTION_IMAGE_GRID
+from watch_archive import watch_archive
+from shard_archive import parse_shard, shard_days, save_shard_pixel_stats, merge_shards
+from config import LATEST, BATCH_SIZE, SINGLE_VOLUME, CREATE_COVER, INCLUDE_VIDEO, INCLUDE_DESCRIPTION, EXCLUDE_IMAGES, INCLUDE_DESCRIPTION_IMAGE, INCLUDE_DESCRIPTION_IMAGE_GRID, GEMINI_BATCH_SIZE, WATCH, WATCH_INTERVAL, BASEPAINT_API_URL, BASEPAINT_ANIMATIONS_URL
+
+
+def positive_int(text):
+    value = int(text)
+    if value < 1:
+        raise ArgumentTypeError(f"{text} is not a positive integer")
+    return value
 
 
 if __name__ == '__main__':
@@ -15,16 +24,42 @@ if __name__ == '__main__':
     parser.add_argument('-d', '--include-description', action='store_true', default=INCLUDE_DESCRIPTION, help='Include image descriptions')
     parser.add_argument('-di', '--include-description-image', action='store_true', default=INCLUDE_DESCRIPTION_IMAGE, help='Include thumbnail under the image descriptions')
     parser.add_argument('-dig', '--include-description-image-grid', action='store_true', default=INCLUDE_DESCRIPTION_IMAGE_GRID, help='Include grid on top of image descriptions')
+    parser.add_argument('-db', '--description-batch', type=positive_int, default=GEMINI_BATCH_SIZE, help='Images described per Gemini request')
     parser.add_argument('-e', '--exclude-images', action='store_true', default=EXCLUDE_IMAGES, help='Exclude pages with images and metadata')
+    parser.add_argument('-s', '--single-volume', action='store_true', default=SINGLE_VOLUME, help='Create a single PDF with all days instead of batches')
+    parser.add_argument('-w', '--watch', action='store_true', default=WATCH, help='Keep running and archive each new day incrementally')
+    parser.add_argument('--watch-interval', type=int, default=WATCH_INTERVAL, help='Seconds between polls for the next day in watch mode')
+    parser.add_argument('--api-url', default=BASEPAINT_API_URL, help='Base URL for metadata and images (e.g. a local stand-in)')
+    parser.add_argument('--animations-url', default=BASEPAINT_ANIMATIONS_URL, help='Base URL for videos (e.g. a local stand-in)')
+    parser.add_argument('--shard', type=parse_shard, help='Only build shard i of N (e.g. 2/3), split on batch boundaries')
+    parser.add_argument('--merge-shards', nargs='+', metavar='DIR', help='Merge the output of shard runs from these directories instead of building')
     args = parser.parse_args()
+    if args.shard and args.watch:
+        parser.error("--shard and --watch can't be combined")
+    if args.merge_shards and args.shard:
+        parser.error("--merge-shards can't be combined with --shard")
+    if args.single_volume and (args.shard or args.watch):
+        parser.error("--single-volume can't be combined with --shard or --watch")
 
-    print(f"Creating archive for up to day {LATEST}.")
-    fetch_files(LATEST, "images")
-    create_metadata_csv(LATEST)
-    enrich_metadata_csv()
-    if args.include_video:
-        fetch_files(LATEST, "videos")
-    if args.include_description:
-        create_reduced_images()
-        create_description_csv()
-    create_pdf(BATCH_SIZE, args.create_cover, args.include_video, args.include_description, args.exclude_images, args.include_description_image, args.include_description_image_grid)
+    if args.merge_shards:
+        try:
+            merge_shards(args.merge_shards, args.create_cover)
+        except ValueError as e:
+            parser.error(str(e))
+    else:
+        days = shard_days(LATEST, BATCH_SIZE, *args.shard) if args.shard else None
+        shard_text = f" (shard {args.shard[0]}/{args.shard[1]}, {len(days)} days)" if args.shard else ""
+        print(f"Creating archive for up to day {LATEST}{shard_text}.")
+        fetch_files(LATEST, "images", args.api_url, args.animations_url, days)
+        create_metadata_csv(LATEST, args.api_url, days)
+        enrich_metadata_csv()
+        if args.include_video:
+            fetch_files(LATEST, "videos", args.api_url, args.animations_url, days)
+        if args.include_description:
+            create_reduced_images(days=days)
+            create_description_csv(args.description_batch, days)
+        color_dict = create_pdf(BATCH_SIZE, args.create_cover and not args.shard, args.include_video, args.include_description, args.exclude_images, args.include_description_image, args.include_description_image_grid, days, args.single_volume, bool(args.shard))
+        if args.shard:
+            save_shard_pixel_stats(color_dict)
+        if args.watch:
+            watch_archive(LATEST, BATCH_SIZE, args.create_cover, args.include_video, args.include_description, args.exclude_images, args.include_description_image, args.include_description_image_grid, args.watch_interval, args.api_url, args.animations_url)
@@ -0,0 +1,101 @@
+import os
+from io import BytesIO
+from PIL import Image
+from reportlab.lib.utils import ImageReader
+
+
+def filter_day_files(files, days=None):
+    """
+    Keep only the files (e.g. `0042.jpg`) of the given days, e.g. those of a shard. All of them if days is None.
+    """
+    if days is None:
+        return files
+    days = set(days)
+    return [f for f in files if int(f.split('.')[0]) in days]
+
+
+def select_days(first, last, days=None):
+    """
+    Days from first to last (both included), or only the given ones, e.g. those of a shard.
+    """
+    return range(first, last + 1) if days is None else days
+
+
+def pixel_colors(image):
+    """
+    {(r, g, b): pixel count} of an RGB image, counted by PIL instead of looping over every pixel in python.
+    """
+    return {color: count for count, color in image.getcolors(maxcolors=image.width * image.height)}
+
+
+def palette_percentages(colors, palette, total, name=""):
+    percentages = [colors.get(tuple(color), 0) / total * 100 for color in palette]
+    errors = total - sum(colors.get(color, 0) for color in {tuple(color) for color in palette})
+    if errors:  # image 547 fails
+        print(f"count_pixels errors for {name}: {errors} pixels not matching palette colors")
+    return percentages
+
+
+class SharedImageReader(ImageReader):
+    """
+    ImageReader over an image that is already decoded, so reportlab doesn't decode it again. JPEGs are still embedded as is.
+    """
+    def __init__(self, data, image):
+        self._shared_image = image
+        super().__init__(BytesIO(data))
+
+    def _read_image(self, fp):
+        return self._shared_image
+
+
+class DayContext:
+    """
+    Source images of a single day, each read and decoded at most once and shared by all the pages of that day.
+    """
+    def __init__(self, script_dir, day_num):
+        self.day_num = day_num
+        self.image_path = os.path.join(script_dir, "images", f"{day_num:04d}.jpg")
+        self.reduced_path = os.path.join(script_dir, "reduced_images", f"{day_num:04d}.png")
+        self._decoded = {}
+        self._readers = {}
+        self._rgb = None
+        self._colors = None
+
+    def _decode(self, path):
+        if path not in self._decoded:
+            with open(path, 'rb') as f:
+                data = f.read()
+            image = Image.open(BytesIO(data))
+            image.load()
+            self._decoded[path] = (data, image)
+        return self._decoded[path]
+
+    def _reader(self, path):
+        if path not in self._readers:
+            self._readers[path] = SharedImageReader(*self._decode(path))
+        return self._readers[path]
+
+    @property
+    def rgb(self):
+        if self._rgb is None:
+            image = self._decode(self.image_path)[1]
+            self._rgb = image if image.mode == "RGB" else image.convert("RGB")
+        return self._rgb
+
+    @property
+    def image_reader(self):
+        return self._reader(self.image_path)
+
+    @property
+    def reduced_reader(self):
+        return self._reader(self.reduced_path)
+
+    @property
+    def colors(self):
+        if self._colors is None:
+            self._colors = pixel_colors(self.rgb)
+        return self._colors
+
+    def palette_counts(self, palette):
+        rgb = self.rgb
+        return palette_percentages(self.colors, palette, rgb.width * rgb.height, self.image_path)
@@ -0,0 +1,137 @@
+import os
+import csv
+import re
+import hashlib
+from collections import defaultdict
+
+COORD_REGEX = r"\((\d+)\.*\d*,\s*(\d+)\.*\d*\)"  # LLMs sometimes use decimals -_-
+STORE_FIELDNAMES = ['DAY', 'X', 'Y', 'LABEL', 'TEXT', 'FLAGS']
+STORE_SOURCE = "description_store.sha256"  # hash of the description.csv the store matches
+
+
+def parse_description_line(line):
+    """
+    Split a raw `(X,Y) <element>: <description>` line once, flagging whatever the LLM got wrong.
+    """
+    coords = re.search(COORD_REGEX, line)
+    if not coords:  # LLMs don't always follow explicit instructions on format...
+        return {'x': None, 'y': None, 'label': '', 'text': line, 'flags': ['no_coords']}
+
+    flags = []
+    x, y = [int(m) for m in coords.groups()]
+    if max(x, y) > 100:  # LLMs don't always follow restrictions -_-
+        flags.append('out_of_range')
+    rest = line[coords.end():].strip()
+    if ":" in rest:
+        label, text = rest.split(":", 1)
+    else:  # LLMs don't always follow the required format -_-
+        label, text = "", rest
+        flags.append('no_label')
+    return {'x': x, 'y': y, 'label': label.strip().strip('*').strip(), 'text': text.strip().lstrip('*').strip(), 'flags': flags}
+
+
+def store_writer(storefile):
+    writer = csv.DictWriter(storefile, fieldnames=STORE_FIELDNAMES)
+    if storefile.tell() == 0:  # new (or empty) store
+        writer.writeheader()
+    return writer
+
+
+def write_store_rows(writer, day, lines):
+    entries = [parse_description_line(line) for line in lines if line]
+    for entry in entries:
+        writer.writerow({'DAY': day, 'X': entry['x'], 'Y': entry['y'], 'LABEL': entry['label'], 'TEXT': entry['text'], 'FLAGS': ';'.join(entry['flags'])})
+    return entries
+
+
+def source_digest(script_dir):
+    with open(os.path.join(script_dir, "description.csv"), 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def save_store_source(script_dir):
+    """
+    Record that the store matches the current description.csv. Call it after appending to both.
+    """
+    with open(os.path.join(script_dir, STORE_SOURCE), 'w') as f:
+        f.write(source_digest(script_dir))
+
+
+def build_description_store(script_dir):
+    description_csv = os.path.join(script_dir, "description.csv")
+    raw_descriptions = defaultdict(list)
+    with open(description_csv, 'r', encoding='utf-8') as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            raw_descriptions[int(row['filename'])].append(row['analysis'])
+
+    with open(os.path.join(script_dir, "description_store.csv"), 'w', newline='', encoding='utf-8') as storefile:
+        writer = store_writer(storefile)
+        for day, lines in sorted(raw_descriptions.items()):
+            write_store_rows(writer, day, lines)
+    save_store_source(script_dir)
+    print("Finished building description store.")
+
+
+def update_description_store(script_dir):
+    """
+    (Re)build the store if it is missing or doesn't match description.csv (e.g. after editing descriptions by hand).
+    Without description.csv there is nothing to match, so any old store is removed.
+    """
+    description_csv = os.path.join(script_dir, "description.csv")
+    store_csv = os.path.join(script_dir, "description_store.csv")
+    source = os.path.join(script_dir, STORE_SOURCE)
+    if not os.path.exists(description_csv):  # e.g. deleted to describe everything again, so new rows start a new store
+        for stale in (store_csv, source):
+            if os.path.exists(stale):
+                os.remove(stale)
+        return
+    if os.path.exists(store_csv) and os.path.exists(source):
+        with open(source, 'r') as f:
+            if f.read().strip() == source_digest(script_dir):
+                return
+    build_description_store(script_dir)
+
+
+def load_description_store(script_dir, include_malformed=False):
+    """
+    Returns {day: [entry]} ready to render. Entries without coordinates are left out unless include_malformed.
+    """
+    update_description_store(script_dir)
+    descriptions = defaultdict(list)
+    store_csv = os.path.join(script_dir, "description_store.csv")
+    if not os.path.exists(store_csv):
+        return descriptions
+    with open(store_csv, 'r', encoding='utf-8') as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            flags = row['FLAGS'].split(';') if row['FLAGS'] else []
+            if 'no_coords' in flags and not include_malformed:
+                continue
+            descriptions[int(row['DAY'])].append({
+                'x': int(row['X']) if row['X'] else None,
+                'y': int(row['Y']) if row['Y'] else None,
+                'label': row['LABEL'],
+                'text': row['TEXT'],
+                'flags': flags,
+            })
+    return descriptions
+
+
+def report_malformed_descriptions(script_dir):
+    descriptions = load_description_store(script_dir, include_malformed=True)
+    malformed = 0
+    for day, entries in sorted(descriptions.items()):
+        flagged = [entry for entry in entries if entry['flags']]
+        if all('no_coords' in entry['flags'] for entry in entries):
+            print(f"Day {day}: no renderable description lines")
+        for entry in flagged:
+            line = entry['text'] if entry['x'] is None else f"({entry['x']},{entry['y']}) {entry['label']}: {entry['text']}"
+            print(f"Day {day} [{','.join(entry['flags'])}]: {line}")
+        malformed += len(flagged)
+    print(f"Found {malformed} flagged description lines in {len(descriptions)} days.")
+    return malformed
+
+
+if __name__ == '__main__':
+    report_malformed_descriptions(os.path.dirname(os.path.abspath(__file__)))
@@ -1,6 +1,9 @@
 import requests
 import os
 
+from day_context import select_days
+from config import BASEPAINT_API_URL, BASEPAINT_ANIMATIONS_URL
+
 
 def download_file(url, filename, datatype):
     response = requests.get(url, stream=True)
@@ -8,29 +11,44 @@ def download_file(url, filename, datatype):
         with open(filename, 'wb') as f:
             for chunk in response.iter_content(1024):
                 f.write(chunk)
-    else:
-        print(f"Failed to download {datatype} from {url}")
+        return True
+    print(f"Failed to download {datatype} from {url}")
+    return False
+
 
+def file_url(day, datatype, api_url=BASEPAINT_API_URL, animations_url=BASEPAINT_ANIMATIONS_URL):
+    if datatype == "images":
+        return f"{api_url}/art/image?day={day}"  # jpg image 2560x2560
+        # available in png at lower res too at https://basepaint.net/v3/{day:04d}.png
+    return f"{animations_url}/{day:04d}.mp4"
 
-def fetch_files(latest, datatype="images"):
+
+def file_path(day, datatype="images"):
     script_dir = os.path.dirname(os.path.abspath(__file__))
-    images_dir = os.path.join(script_dir, datatype)
-    os.makedirs(images_dir, exist_ok=True)  # Create files directory if needed
+    files_dir = os.path.join(script_dir, datatype)
+    os.makedirs(files_dir, exist_ok=True)  # Create files directory if needed
+    extension = "jpg" if datatype == "images" else "mp4"
+    return os.path.join(files_dir, f"{day:04d}.{extension}")
 
+
+def fetch_file(day, datatype="images", api_url=BASEPAINT_API_URL, animations_url=BASEPAINT_ANIMATIONS_URL):
+    """
+    Download a single day's file unless already present. Returns its path, or None if it could not be fetched.
+    """
+    path = file_path(day, datatype)
+    if os.path.exists(path) or download_file(file_url(day, datatype, api_url, animations_url), path, datatype):
+        return path
+    return None
+
+
+def fetch_files(latest, datatype="images", api_url=BASEPAINT_API_URL, animations_url=BASEPAINT_ANIMATIONS_URL, days=None):
     skipped_days = []
     print(f"Fetching {datatype}...")
-    extension = "jpg" if datatype == "images" else "mp4"
-    for day in range(1, latest):
-        path = os.path.join(images_dir, f"{day:04d}.{extension}")
-        if os.path.exists(path):
+    for day in select_days(1, latest - 1, days):
+        if os.path.exists(file_path(day, datatype)):
             skipped_days.append(day)  
             continue
-        if datatype == "images":
-            file_url = f"https://basepaint.xyz/api/art/image?day={day}"  # jpg image 2560x2560
-            # available in png at lower res too at https://basepaint.net/v3/{day:04d}.png
-        elif datatype == "videos":
-            file_url = f"https://basepaint.net/animations/{day:04d}.{extension}"
-        download_file(file_url, path, datatype)
+        fetch_file(day, datatype, api_url, animations_url)
         if day % 10 == 0:
             print(f"Downloading {datatype} {day}")
     print(f"Skipped days (already downloaded): {skipped_days}")
@@ -3,9 +3,14 @@ import csv
 import os
 from typing import Dict, List, Any
 
+from day_context import select_days
+from config import BASEPAINT_API_URL
 
-def fetch_day_data(day: int) -> Dict[str, Any]:
-    url = f'https://basepaint.xyz/api/art/{day}'
+FIELDNAMES = ['NUM', 'TITLE', 'PALETTE', 'MINTED', 'ARTISTS', 'PROPOSER', 'MINT_DATE']
+
+
+def fetch_day_data(day: int, api_url: str = BASEPAINT_API_URL) -> Dict[str, Any]:
+    url = f'{api_url}/art/{day}'
     response = requests.get(url)
     response.raise_for_status()
     return response.json()
@@ -37,11 +42,21 @@ def extract_metadata(data: Dict[str, Any], fieldnames: List[str]) -> Dict[str, A
     return metadata
 
 
-def create_metadata_csv(max_day: int):
+def fetch_metadata_row(day: int, api_url: str = BASEPAINT_API_URL, data: Dict[str, Any] = None) -> Dict[str, Any]:
+    metadata = extract_metadata(data or fetch_day_data(day, api_url), FIELDNAMES)
+    metadata['MINTED'] = "N/A"  # Set MINTED to 0 since it's not available in the API
+    return metadata
+
+
+def append_metadata_row(csv_path: str, metadata: Dict[str, Any]):
+    with open(csv_path, 'a', newline='') as csvfile:
+        csv.DictWriter(csvfile, fieldnames=FIELDNAMES).writerow(metadata)
+
+
+def create_metadata_csv(max_day: int, api_url: str = BASEPAINT_API_URL, days: List[int] = None):
     skipped_days = []
     script_dir = os.path.dirname(os.path.abspath(__file__))
     csv_path = os.path.join(script_dir, "metadata.csv")
-    fieldnames = ['NUM', 'TITLE', 'PALETTE', 'MINTED', 'ARTISTS', 'PROPOSER', 'MINT_DATE']
     
     existing_days = set()
     if os.path.exists(csv_path):  # Read existing days from CSV if it exists
@@ -51,19 +66,17 @@ def create_metadata_csv(max_day: int):
     
     mode = 'a' if existing_days else 'w'  # Open in append mode if file exists, write mode if it doesn't
     with open(csv_path, mode, newline='') as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+        writer = csv.DictWriter(csvfile, fieldnames=FIELDNAMES)
         if mode == 'w':
             writer.writeheader()
         
         print("Fetching metadata...")
-        for day in range(1, max_day + 1):
+        for day in select_days(1, max_day, days):
             if day in existing_days:
                 skipped_days.append(day)
                 continue
             try:
-                data = fetch_day_data(day)
-                metadata = extract_metadata(data, fieldnames)
-                metadata['MINTED'] = "N/A"  # Set MINTED to 0 since it's not available in the API
+                metadata = fetch_metadata_row(day, api_url)
                 writer.writerow(metadata)
                 if day % 10 == 0:
                     print(f"Processed Day {day}: {metadata['TITLE']}")
@@ -78,17 +91,21 @@ def load_titles(csv_path):
     with open(csv_path, 'r', encoding='utf-8') as f:
         reader = csv.DictReader(f)
         for row in reader:
-            titles[int(row['NUM'])] = {
-                'title': row['TITLE'],
-                'palette': [tuple(map(int, color.strip().split(','))) for color in row['PALETTE'].split(';')],
-                'minted': row.get('MINTED', 0),
-                'artists': row.get('ARTISTS', 0),
-                'proposer': row.get('PROPOSER', ''),
-                'MINT_DATE': row.get('MINT_DATE', ''),
-            }
+            titles[int(row['NUM'])] = title_entry(row)
     return titles
 
 
+def title_entry(row):
+    return {
+        'title': row['TITLE'],
+        'palette': [tuple(map(int, color.strip().split(','))) for color in row['PALETTE'].split(';')],
+        'minted': row.get('MINTED', 0),
+        'artists': row.get('ARTISTS', 0),
+        'proposer': row.get('PROPOSER', ''),
+        'MINT_DATE': row.get('MINT_DATE', ''),
+    }
+
+
 def draw_header(canvas, day_num, titles, x_pos, page_height, page_width):
     title_data = titles.get(day_num, {'title': '', 'palette': []})
     title = f"Day {day_num}: {title_data['title']}"
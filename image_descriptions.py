@@ -1,29 +1,37 @@
 import os
 import csv
 import re
-from time import sleep
+from collections import defaultdict
+from time import sleep, time
 from PIL import Image
 
 import google.generativeai as genai
 
-from config import GOOGLE_API_KEY, GEMINI_MODEL, GEMINI_SLEEP, ARCHIVE_VERSION
+from config import GOOGLE_API_KEY, GEMINI_MODEL, GEMINI_SLEEP, GEMINI_BATCH_SIZE, GEMINI_BATCH_IMAGE_SIZE, ARCHIVE_VERSION
 from fetch_metadata import load_titles, draw_header
+from day_context import filter_day_files
+from description_store import COORD_REGEX, update_description_store, save_store_source, store_writer, write_store_rows
 
+SECTION_REGEX = r"^[#=\s]*Image\s*#?(\d+)\b"  # header of each image in batched answers, e.g. `Image 3`
+ANALYSIS_PROMPT = " Take into account the color palette and resolution limitations. Identify all notable elements with emphasis on Internet memes, but mind tv, anime, games, comic, culture and other references too."
+ANALYSIS_PROMPT += " Sort the elements according to their relevance. The bigger ones should be more prominent. In case of a tie, sort them by position (the ones on top and left should be first)."
+ANALYSIS_PROMPT += " Output format should be one line for each element as follows: `(X,Y) <element>: <description>`, considering that images are square and 0,0 represents top left corner and 100,100 bottom right corner. (X,Y) represents the central pixel coordinate where the element is located. Also do not include any output that doesn't comply with this format."
 
-def create_description_csv():
+
+def create_description_csv(batch_size=GEMINI_BATCH_SIZE, days=None):
     script_dir = os.path.dirname(os.path.abspath(__file__))
     titles = load_titles(os.path.join(script_dir, "metadata.csv"))
     metadata_days = {int(k): v["title"] for k, v in titles.items()}
-    describe_png_images_to_csv(metadata_days, script_dir)
+    describe_png_images_to_csv(metadata_days, script_dir, batch_size, days=days)
 
 
-def create_reduced_images(block_size=2, output_format="png"):
+def create_reduced_images(block_size=2, output_format="png", days=None):
     """
     Original images have square blocks many pixels tall. Shrink them using the top-left pixel.
     """
     script_dir = os.path.dirname(os.path.abspath(__file__))
     image_dir = os.path.join(script_dir, "images")
-    image_files = sorted([f for f in os.listdir(image_dir) if f.endswith('.jpg')])
+    image_files = filter_day_files(sorted([f for f in os.listdir(image_dir) if f.endswith('.jpg')]), days)
     reduced_dir = os.path.join(script_dir, "reduced_images")
     os.makedirs(reduced_dir, exist_ok=True)  # Create pdf directory if needed
 
@@ -36,31 +44,32 @@ def create_reduced_images(block_size=2, output_format="png"):
             continue
 
         try:
-            img = Image.open(os.path.join(image_dir, image_file))
-            width, height = img.size
-            new_width = width // block_size
-            new_height = height // block_size  # square images could use width instead
-            reduced_image = Image.new("RGB", (new_width, new_height))
-            reduced_pixels = reduced_image.load()
-            original_pixels = img.load()
-
-            # Take the color of the top-left pixels of the original blocks
-            for y_new in range(new_height):
-                for x_new in range(new_width):
-                    x_original = x_new * block_size
-                    y_original = y_new * block_size
-                    color = original_pixels[x_original, y_original]
-                    reduced_pixels[x_new, y_new] = color
-            reduced_image.save(output_img)
-
+            reduce_image(os.path.join(image_dir, image_file), output_img, block_size)
         except Exception as e:
             print(f"An error occurred processing {image_name}: {e}")
 
 
+def reduce_image(image_path, output_img, block_size=2):
+    img = Image.open(image_path)
+    width, height = img.size
+    new_width = width // block_size
+    new_height = height // block_size  # square images could use width instead
+    reduced_image = Image.new("RGB", (new_width, new_height))
+    reduced_pixels = reduced_image.load()
+    original_pixels = img.load()
+
+    # Take the color of the top-left pixels of the original blocks
+    for y_new in range(new_height):
+        for x_new in range(new_width):
+            x_original = x_new * block_size
+            y_original = y_new * block_size
+            color = original_pixels[x_original, y_original]
+            reduced_pixels[x_new, y_new] = color
+    reduced_image.save(output_img)
+
+
 def analyze_image_with_metadata(model, image_path, title_text):
-    prompt_text = f"Analyze in detail all the elements of this pixel art image from basepaint.xyz project.{title_text} Take into account the color palette and resolution limitations. Identify all notable elements with emphasis on Internet memes, but mind tv, anime, games, comic, culture and other references too."
-    prompt_text += " Sort the elements according to their relevance. The bigger ones should be more prominent. In case of a tie, sort them by position (the ones on top and left should be first)."
-    prompt_text += " Output format should be one line for each element as follows: `(X,Y) <element>: <description>`, considering that images are square and 0,0 represents top left corner and 100,100 bottom right corner. (X,Y) represents the central pixel coordinate where the element is located. Also do not include any output that doesn't comply with this format."
+    prompt_text = f"Analyze in detail all the elements of this pixel art image from basepaint.xyz project.{title_text}" + ANALYSIS_PROMPT
     res = ""
     try:
         img = Image.open(image_path)
@@ -72,11 +81,60 @@ def analyze_image_with_metadata(model, image_path, title_text):
         return res
 
 
-def describe_png_images_to_csv(metadata_days, script_dir):
+def analyze_images_batch(model, image_paths, title_texts):
+    """
+    Describe several images in a single request. Returns {position: description} (1-based) for well formed sections only.
+    """
+    prompt_text = f"Analyze in detail all the elements of each of the following {len(image_paths)} pixel art images from basepaint.xyz project. Each image comes right after its number and title."
+    prompt_text += ANALYSIS_PROMPT
+    prompt_text += " Start the output of each image with a line containing only `Image <number>` (e.g. `Image 1`), followed by the lines of its elements."
+    contents = [prompt_text]
+    try:
+        for position, (image_path, title_text) in enumerate(zip(image_paths, title_texts), 1):
+            img = Image.open(image_path)
+            if img.width > GEMINI_BATCH_IMAGE_SIZE:  # nearest keeps the pixel art blocks intact
+                img = img.resize((GEMINI_BATCH_IMAGE_SIZE, GEMINI_BATCH_IMAGE_SIZE), Image.NEAREST)
+            contents += [f"Image {position}: {title_text}", img]
+        response = model.generate_content(contents)
+        return parse_batch_sections(response.candidates[0].content.parts[0].text, len(image_paths))
+    except Exception as e:
+        print(f"Error during batch analysis of images {image_paths}: {e}")
+        return {}
+
+
+def parse_batch_sections(text, image_count):
+    sections = defaultdict(list)
+    position = None
+    for line in description_lines(text):
+        header = re.match(SECTION_REGEX, line)
+        if header:
+            position = int(header.group(1))
+        elif position is not None and line:
+            sections[position].append(line)
+    # a section without a single coordinate line is considered malformed (e.g. refusals or merged images)
+    return {position: "\n".join(lines) for position, lines in sections.items()
+            if 1 <= position <= image_count and any(re.search(COORD_REGEX, l) for l in lines)}
+
+
+def create_model():
     genai.configure(api_key=GOOGLE_API_KEY)
-    model = genai.GenerativeModel(GEMINI_MODEL)
+    return genai.GenerativeModel(GEMINI_MODEL)
+
+
+def description_lines(description):
+    return [d.strip().lstrip('*').strip() for d in description.split("\n")]
+
+
+def describe_png_images_to_csv(metadata_days, script_dir, batch_size=GEMINI_BATCH_SIZE, model=None, days=None):
+    """
+    With batch_size > 1 several images are described per request, falling back to one request per image for those
+    whose section can't be parsed. Any object with a compatible `generate_content` can be passed as model (e.g. a fake).
+    Returns {day: [entry]} with the store entries of the newly described days.
+    """
+    model = model or create_model()
     reduced_dir = os.path.join(script_dir, "reduced_images")
     description_csv = os.path.join(script_dir, "description.csv")
+    update_description_store(script_dir)  # new descriptions are appended to both, so it must be up to date first
 
     existing_ids = set()
     if os.path.exists(description_csv):
@@ -87,29 +145,53 @@ def describe_png_images_to_csv(metadata_days, script_dir):
             except Exception as e:
                 print(f"Error reading description csv: {e}")
 
-    with open(description_csv, "a", newline="") as csvfile:
+    with open(description_csv, "a", newline="") as csvfile, open(os.path.join(script_dir, "description_store.csv"), "a", newline="", encoding="utf-8") as storefile:
         csv_writer = csv.writer(csvfile)
+        structured_writer = store_writer(storefile)
         if not existing_ids:
             csv_writer.writerow(["filename", "analysis"])
 
-        for filename in sorted(os.listdir(reduced_dir)):
-            if filename.endswith(".png"):
-                image_id = int(os.path.splitext(filename)[0])
-                if image_id in existing_ids:
-                    continue
-                title_text = metadata_days.get(image_id, "")
-                description = analyze_image_with_metadata(model, os.path.join(reduced_dir, filename), title_text)
-                if description:
-                    for d in description.split("\n"):
-                        csv_writer.writerow([image_id, d.strip().lstrip('*').strip()])
-                if image_id % GEMINI_SLEEP[0] == 0:
-                    print(f"Analyzed image with metadata: {filename} . Sleeping {GEMINI_SLEEP[1]} secs to avoid rate limits.")
-                    sleep(GEMINI_SLEEP[1])
+        pending = [int(os.path.splitext(f)[0]) for f in filter_day_files(sorted(os.listdir(reduced_dir)), days) if f.endswith(".png")]
+        pending = [image_id for image_id in pending if image_id not in existing_ids]
+        start, requests, described = time(), 0, 0
+        new_entries = {}
+        for i in range(0, len(pending), batch_size):
+            batch_ids = pending[i:i + batch_size]
+            image_paths = [os.path.join(reduced_dir, f"{image_id:04d}.png") for image_id in batch_ids]
+            descriptions = {}
+            if len(batch_ids) > 1:
+                sections = analyze_images_batch(model, image_paths, [metadata_days.get(image_id, "") for image_id in batch_ids])
+                descriptions = {batch_ids[position - 1]: section for position, section in sections.items()}
+                requests = throttle(requests + 1)
+            for image_id, image_path in zip(batch_ids, image_paths):
+                if image_id not in descriptions:  # single image request, either by choice or as fallback
+                    descriptions[image_id] = analyze_image_with_metadata(model, image_path, metadata_days.get(image_id, ""))
+                    requests = throttle(requests + 1)
+                if descriptions[image_id]:
+                    described += 1
+                    lines = description_lines(descriptions[image_id])
+                    for d in lines:
+                        csv_writer.writerow([image_id, d])
+                    new_entries[image_id] = write_store_rows(structured_writer, image_id, lines)
+            print(f"Analyzed images with metadata up to {batch_ids[-1]:04d}.png")
+    save_store_source(script_dir)
+    minutes = (time() - start) / 60
+    if requests and minutes:
+        print(f"Described {described} images in {requests} requests: {described / requests:.2f} images/request, {described / minutes:.2f} images/minute.")
     print("Finished creating description csv.")
+    return new_entries
+
 
+def throttle(requests):
+    if requests % GEMINI_SLEEP[0] == 0:
+        print(f"Sent {requests} requests. Sleeping {GEMINI_SLEEP[1]} secs to avoid rate limits.")
+        sleep(GEMINI_SLEEP[1])
+    return requests
 
-def create_description_page(canvas, script_dir,page_width, page_height, x_pos, day_num, descriptions, titles, include_description_image, include_description_image_grid):
-    current_description = descriptions.get(int(day_num))
+
+def create_description_page(canvas, day, page_width, page_height, x_pos, descriptions, titles, include_description_image, include_description_image_grid):
+    day_num = day.day_num
+    current_description = descriptions.get(int(day_num))  # already parsed entries from the description store
     if not current_description:
         print(f"No description found for day {day_num}")
         return
@@ -119,13 +201,13 @@ def create_description_page(canvas, script_dir,page_width, page_height, x_pos, d
     canvas.drawString(x_pos + 100, page_height - 54, description_label)
     canvas.setFont("OpenSans-Italic", 14)
     canvas.drawString(x_pos + 100 + canvas.stringWidth(description_label) + 20, page_height - 54, f"({GEMINI_MODEL})")
-    render_description_text(canvas, page_height, x_pos, day_num, current_description, titles.get(day_num, {"title": ""})["title"])
+    render_description_text(canvas, page_height, x_pos, current_description, titles.get(day_num, {"title": ""})["title"])
     if include_description_image:    
-        draw_description_grid(canvas, script_dir, page_width, page_height, x_pos, day_num, current_description, include_description_image_grid)
+        draw_description_grid(canvas, day, page_width, page_height, x_pos, current_description, include_description_image_grid)
     canvas.showPage()
 
 
-def render_description_text(canvas, page_height, x_pos, day_num, descriptions, title):
+def render_description_text(canvas, page_height, x_pos, descriptions, title):
     canvas.setFont("OpenSans-Bold", 12)
     canvas.drawString(x_pos, page_height - 85 + 12, f"(X, Y): {title}")
     title_width = canvas.stringWidth(f"(X, Y): {title}", "OpenSans-Bold", 12)
@@ -133,41 +215,23 @@ def render_description_text(canvas, page_height, x_pos, day_num, descriptions, t
     canvas.drawString(x_pos + title_width + 2, page_height - 85 + 13, "(more info at https://github.com/isaacbernat/basepaint)")
 
     canvas.setFont("OpenSans-Regular", 10)
-    coord_regex = r"\((\d+)\.*\d*,\s*(\d+)\.*\d*\)"  # LLMs sometimes use decimals -_-
-    max_value = 0
-    for line_num, l in enumerate(descriptions):
-        try:
-            x, y = [int(m) for m in re.search(coord_regex, l).groups()]
-        except Exception as e:
-            print(f"DEBUG: {day_num=} doesn't match regex {l=}")
-            continue  # LLMs don't always follow explicit instructions on format...
-
-        max_value = max(max_value, x, y)
-        canvas.drawString(x_pos, page_height - 85 - line_num * 12, f"({x},{y})")
-        try:
-            label, value = l.split(")", 1)[1].strip().split(":", 1)
-        except:  # LLMs don't always follow the required format -_-
-            value = l.split(")", 1)[1].strip()
-            label = ""
-
+    for line_num, entry in enumerate(descriptions):  # malformed lines are reported by description_store.py instead
+        canvas.drawString(x_pos, page_height - 85 - line_num * 12, f"({entry['x']},{entry['y']})")
         canvas.setFont("OpenSans-Bold", 10)
-        canvas.drawString(x_pos + 35, page_height - 85 - line_num * 12, f"{label.strip()}: ")
+        canvas.drawString(x_pos + 35, page_height - 85 - line_num * 12, f"{entry['label']}: ")
         canvas.setFont("OpenSans-Regular", 10)
-        label_width = canvas.stringWidth(f"{label.strip()}: ", "OpenSans-Bold", 10)
-        canvas.drawString(x_pos + 35 + label_width, page_height - 85 - line_num * 12, value.strip())
-    if max_value > 100:
-        print(f"DEBUG: {day_num=}, {max_value=}")  # LLMs don't always follow restrictions -_-
+        label_width = canvas.stringWidth(f"{entry['label']}: ", "OpenSans-Bold", 10)
+        canvas.drawString(x_pos + 35 + label_width, page_height - 85 - line_num * 12, entry['text'])
 
 
-def draw_description_grid(canvas, script_dir, page_width, page_height, x_pos, day_num, descriptions, include_description_image_grid):
+def draw_description_grid(canvas, day, page_width, page_height, x_pos, descriptions, include_description_image_grid):
     filled_page = 85 + ((len(descriptions) + 1) * 12)
     square_size = min(page_height - filled_page, page_width - (x_pos * 2))
     small_square_size = square_size / 10
     square_x_pos = (page_width - square_size) / 2
 
-    output_img = os.path.join(script_dir, "reduced_images", f"{day_num:04d}.png")
     canvas.drawImage(
-        output_img,
+        day.reduced_reader,
         square_x_pos,
         12,
         width=square_size,
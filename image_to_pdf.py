@@ -12,32 +12,47 @@ from PIL import Image
 from video_to_images import extract_images_from_video
 from config import ARCHIVE_VERSION
 from image_descriptions import create_description_page
+from description_store import load_description_store
+from day_context import DayContext, filter_day_files, pixel_colors
+from streaming_canvas import StreamingCanvas
 from fetch_metadata import load_titles, draw_header
 
 
-def load_descriptions(csv_path):
-    descriptions = defaultdict(list)
-    with open(csv_path, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            descriptions[int(row['filename'])].append(row['analysis'])
-    return descriptions
+def add_colors(color_dict, colors):
+    for color, count in colors.items():
+        color_dict[color] += count
+    return color_dict
 
 
-def count_pixels(image_path, palette):
+def add_pixel_stats(color_dict, image_path):
     image = Image.open(image_path).convert("RGB")  # Ensure image is in RGB mode
-    pixel_count = [0] * len(palette)
-    color_dict = {tuple(color): index for index, color in enumerate(palette)}
-    errors = 0
-    for pixel in image.getdata():
-        try:
-            pixel_count[color_dict[pixel]] += 1
-        except Exception as e:  # image 547 fails
-            errors += 1
-    if errors:
-        print(f"count_pixels errors for {image_path}: {errors} pixels not matching palette colors")
+    return add_colors(color_dict, pixel_colors(image))
+
+
+def collect_pixel_stats(image_files, input_directory, color_dict=None):
+    color_dict = defaultdict(int) if color_dict is None else color_dict  # pass one in to add the rest of the images
+    for i, image_file in enumerate(image_files, 1):  # Process each image
+        if i % 10 == 0:
+            print(f"Collecting front-page pixels stats {i}/{len(image_files)}")
+        add_pixel_stats(color_dict, os.path.join(input_directory, image_file))
+    return color_dict
+
 
-    return [(count / (image.width * image.height)) * 100 for count in pixel_count]  # percentage_count
+def save_pixel_stats(csv_path, color_dict):
+    with open(csv_path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['COLOR', 'COUNT'])
+        for color, count in sorted(color_dict.items()):
+            writer.writerow([f"{color[0]}, {color[1]}, {color[2]}", count])
+
+
+def load_pixel_stats(csv_path, color_dict=None):
+    color_dict = defaultdict(int) if color_dict is None else color_dict  # pass one in to add several files up
+    with open(csv_path, 'r', newline='') as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            color_dict[tuple(map(int, row['COLOR'].split(',')))] += int(row['COUNT'])
+    return color_dict
 
 
 def draw_text(canvas, text_italic, text_normal, x, y, italic_offset, x_offset, page_width):
@@ -107,20 +122,11 @@ def draw_description(c, titles, day_num, pixel_counts, x_pos, page_width, first_
     draw_pixel_info(c, sorted_palette, x_pos, first_line_y, left_column_italic_offset)
 
 
-def draw_mosaic(c, x_pos, page_height, image_files, input_directory):
+def draw_mosaic(c, x_pos, page_height, color_dict):
     c.setFont("OpenSans-Regular", 12)
     c.drawString(x_pos + 10, page_height - 180, "Top 100 colors (by pixel count):")
     c.drawString(381, page_height - 180, f"Archive version: {ARCHIVE_VERSION}")
 
-    color_dict = defaultdict(int)
-    for i, image_file in enumerate(image_files, 1):  # Process each image
-        if i % 10 == 0:
-            print(f"Collecting front-page pixels stats {i}/{len(image_files)}")
-        image_path = os.path.join(input_directory, image_file)
-        image = Image.open(image_path).convert("RGB")  # Ensure image is in RGB mode
-        for pixel in image.getdata():
-            color_dict[pixel] += 1
-
     draw_pixel_info(
         c,
         sorted({value: key for key, value in color_dict.items()}.items(), reverse=True),
@@ -141,8 +147,8 @@ def load_fonts():
     pdfmetrics.registerFont(TTFont('MekMono', './fonts/MEK/mek-mono-webfont.ttf'))
 
 
-def create_canvas(output_pdf, size=A4):
-    c = canvas.Canvas(output_pdf, pagesize=size)
+def create_canvas(output_pdf, size=A4, streaming=False):
+    c = (StreamingCanvas if streaming else canvas.Canvas)(output_pdf, pagesize=size)
     c.setStrokeColorRGB(0, 0, 0)  # Set border color to black
     page_width, _ = size
     img_size = 2560 * 72 / 96  # Convert pixels to points (96 DPI to 72 DPI)
@@ -160,7 +166,7 @@ def draw_video_footer_lines(c, page_width, day_num):
 
 def create_video_page(c, script_dir, page_width, page_height, image_file, scaled_width, x_pos, video_image_path, titles):
     day_num = image_file[:-4]
-    title_data = titles.get(int(day_num), {'title': '', 'palette': []})
+    title_data = dict(titles.get(int(day_num), {'title': '', 'palette': []}))  # copy, titles may outlive this page
     title_data['title'] = title_data.get('title', '') + f" (WIP)"
     title_data['palette'] = []
 
@@ -188,16 +194,16 @@ def create_video_page(c, script_dir, page_width, page_height, image_file, scaled
     c.showPage()
 
 
-def create_image_page(c, page_width, page_height, image_file, scaled_width, x_pos, titles, day_num, image_dir):
+def create_image_page(c, page_width, page_height, scaled_width, x_pos, titles, day):
+    day_num = day.day_num
     draw_header(c, day_num, titles, x_pos, page_height, page_width)
-    image_path = os.path.join(image_dir, image_file)
-    c.drawImage(image_path,
+    c.drawImage(day.image_reader,
                 x_pos,  # center horizontally
                 page_height - scaled_width - 70,  # position below header
                 width=scaled_width, 
                 height=scaled_width)
     try:
-        pixel_counts = count_pixels(image_path, titles.get(day_num, {}).get('palette', []))
+        pixel_counts = day.palette_counts(titles.get(day_num, {}).get('palette', []))  # image is already decoded for the page
         draw_description(c, titles, day_num, pixel_counts, x_pos, page_width, first_line_y=(page_height - scaled_width - 90))
     except Exception as e:
         print(f"Error processing image {day_num}: {e}")
@@ -205,42 +211,84 @@ def create_image_page(c, page_width, page_height, image_file, scaled_width, x_po
     c.showPage()
 
 
-def create_pdf_from_images(script_dir, titles, size=A4, batch=100, include_video=False, include_description=False, exclude_images=False, include_description_image=False, include_description_image_grid=False):
+def create_pdf_from_images(script_dir, titles, size=A4, batch=100, include_video=False, include_description=False, exclude_images=False, include_description_image=False, include_description_image_grid=False, days=None, single_volume=False, color_dict=None):
+    """
+    Returns the image files whose pages were rendered (i.e. whose colours were added to color_dict, if any).
+    """
     image_dir = os.path.join(script_dir, "images")
-    image_files = sorted([f for f in os.listdir(image_dir) if f.endswith('.jpg')])
+    image_files = filter_day_files(sorted([f for f in os.listdir(image_dir) if f.endswith('.jpg')]), days)
     pdf_dir = os.path.join(script_dir, "pdf")
     os.makedirs(pdf_dir, exist_ok=True)  # Create pdf directory if needed
     descriptions = {}
     if include_description:
-        descriptions = load_descriptions(os.path.join(script_dir, "description.csv"))
-
-    page_width, page_height = size
-    for page_num, image_file in enumerate(image_files, 1):  # Process each image
-        if page_num % batch == 1:
-            output_pdf = os.path.join(pdf_dir, f"basepaint_archive_{page_num:04d}_to_{page_num+batch-1:04d}.pdf")
-            if os.path.exists(output_pdf):
-                print(f"Skipping {output_pdf} as it already exists")
-            c, x_pos, scaled_width = create_canvas(output_pdf)
+        descriptions = load_description_store(script_dir)
+
+    if single_volume:  # all available days in one PDF, streamed to disk day by day
+        if not image_files:
+            print("Skipping single volume PDF as there are no images")
+            return []
+        first, last = [int(f.split('.')[0]) for f in (image_files[0], image_files[-1])]
+        output_pdf = os.path.join(pdf_dir, f"basepaint_archive_{first:04d}_to_{last:04d}.pdf")
+        create_batch_pdf(output_pdf, script_dir, titles, image_files, descriptions, size, include_video, include_description, exclude_images, include_description_image, include_description_image_grid, streaming=True, color_dict=color_dict)
+        return image_files
+
+    rendered = []
+    batches = defaultdict(list)
+    for image_file in image_files:
+        batches[batch_index(int(image_file.split('.')[0]), batch)].append(image_file)
+    for index, batch_files in sorted(batches.items()):
+        output_pdf = batch_pdf_path(pdf_dir, index * batch + 1, batch)
         if os.path.exists(output_pdf):
+            print(f"Skipping {output_pdf} as it already exists")
+            continue
+        if len(batch_files) < batch:
+            print(f"Skipping {output_pdf} until all its days are available")
             continue
+        create_batch_pdf(output_pdf, script_dir, titles, batch_files, descriptions, size, include_video, include_description, exclude_images, include_description_image, include_description_image_grid, color_dict=color_dict)
+        rendered += batch_files
+    return rendered
+
+
+def create_day_pages(c, script_dir, size, image_file, scaled_width, x_pos, titles, descriptions, include_video=False, include_description=False, exclude_images=False, include_description_image=False, include_description_image_grid=False, color_dict=None):
+    page_width, page_height = size
+    day = DayContext(script_dir, int(image_file.split('.')[0]))  # Extract day number (assuming XXXX.jpg)
+    if not exclude_images:  # double negation may be confusing... but imho it's clearer from the command line point of view
+        create_image_page(c, page_width, page_height, scaled_width, x_pos, titles, day)
+    if include_video:  # frames are separate files used once, drawn straight from disk
+        create_video_page(c, script_dir, page_width, page_height, image_file, scaled_width, x_pos, os.path.join(script_dir, "video_images"), titles)
+    if include_description:
+        create_description_page(c, day, page_width, page_height, x_pos, descriptions, titles, include_description_image, include_description_image_grid)
+    if color_dict is not None:  # cover (or shard) stats, from the image already decoded for the pages
+        add_colors(color_dict, day.colors)
+
 
-        day_num = int(image_file.split('.')[0])  # Extract day number (assuming XXXX.jpg)
-        if page_num % 10 == 0:
-            print(f"Processing image {day_num}/{len(image_files)}")
+def batch_index(day_num, batch):
+    return (day_num - 1) // batch  # batches are aligned to days, i.e. 1..100, 101..200, ...
 
-        if not exclude_images:  # double negation may be confusing... but imho it's clearer from the command line point of view
-            create_image_page(c, page_width, page_height, image_file, scaled_width, x_pos, titles, day_num, image_dir)
-        if include_video:
-            create_video_page(c, script_dir, page_width, page_height, image_file, scaled_width, x_pos, os.path.join(script_dir, "video_images"), titles)
-        if include_description:
-            create_description_page(c, script_dir, page_width, page_height, x_pos, day_num, descriptions, titles, include_description_image, include_description_image_grid)
 
-        if page_num % batch == 0:
-            c.save()
-            print(f"saved {output_pdf}")
+def batch_pdf_path(pdf_dir, day_num, batch):
+    first = batch_index(day_num, batch) * batch + 1  # first day of the batch containing day_num
+    return os.path.join(pdf_dir, f"basepaint_archive_{first:04d}_to_{first+batch-1:04d}.pdf")
 
 
-def create_cover(script_dir, size, image_files):
+def create_batch_pdf(output_pdf, script_dir, titles, image_files, descriptions, size=A4, include_video=False, include_description=False, exclude_images=False, include_description_image=False, include_description_image_grid=False, streaming=False, color_dict=None):
+    """
+    Render (or overwrite) a single batch PDF. The colours of its images are added to color_dict, if any.
+    With streaming, each day's pages are written to disk as soon as they are done, so memory doesn't grow with the number of days.
+    """
+    c, x_pos, scaled_width = create_canvas(output_pdf, size, streaming)
+    for image_file in image_files:
+        day_num = int(image_file.split('.')[0])
+        if day_num % 10 == 0:
+            print(f"Processing image {day_num}")
+        create_day_pages(c, script_dir, size, image_file, scaled_width, x_pos, titles, descriptions, include_video, include_description, exclude_images, include_description_image, include_description_image_grid, color_dict)
+        if streaming:
+            c.flush()
+    c.save()
+    print(f"saved {output_pdf}")
+
+
+def create_cover(script_dir, size, image_files, color_dict=None):
     print("Creating PDF cover...")
     img_dir = os.path.join(script_dir, "images")
     pdf_dir = os.path.join(script_dir, "pdf")
@@ -257,7 +305,9 @@ def create_cover(script_dir, size, image_files):
     c.drawString(x_pos + 10, page_height - 105, subtitle)
     c.drawString(349, page_height - 105, f"From day #1 to #{len(image_files)}")
 
-    draw_mosaic(c, x_pos, page_height, image_files, img_dir)
+    if color_dict is None:
+        color_dict = collect_pixel_stats(image_files, img_dir)
+    draw_mosaic(c, x_pos, page_height, color_dict)
     draw_footer_line(c, 40, page_width, "Artwork generated collaboratively at  ", f"https://basepaint.xyz")
     draw_footer_line(c, 40 - 15, page_width, "Archive available at  ", "https://github.com/isaacbernat/basepaint")
 
@@ -265,17 +315,27 @@ def create_cover(script_dir, size, image_files):
     c.save()
 
 
-def create_pdf(batch_size=100, add_cover=True, include_video=False, include_description=False, exclude_images=False, include_description_image=False, include_description_image_grid=False):
+def create_pdf(batch_size=100, add_cover=True, include_video=False, include_description=False, exclude_images=False, include_description_image=False, include_description_image_grid=False, days=None, single_volume=False, pixel_stats=False):
+    """
+    With add_cover or pixel_stats, returns the colour histogram of the days' images. Images of rendered pages are
+    counted while rendering, only those of skipped batches are decoded again.
+    """
     script_dir = os.path.dirname(os.path.abspath(__file__))
     titles = load_titles('metadata.csv')
     load_fonts()
-    create_pdf_from_images(script_dir, titles, size=A4, batch=batch_size, include_video=include_video, include_description=include_description, exclude_images=exclude_images, include_description_image=include_description_image, include_description_image_grid=include_description_image_grid)
-    if add_cover:
+    color_dict = defaultdict(int) if add_cover or pixel_stats else None
+    rendered = create_pdf_from_images(script_dir, titles, size=A4, batch=batch_size, include_video=include_video, include_description=include_description, exclude_images=exclude_images, include_description_image=include_description_image, include_description_image_grid=include_description_image_grid, days=days, single_volume=single_volume, color_dict=color_dict)
+    if color_dict is not None:
         img_dir = os.path.join(script_dir, "images")
-        image_files = sorted([f for f in os.listdir(img_dir) if f.endswith('.jpg')])
+        image_files = filter_day_files(sorted([f for f in os.listdir(img_dir) if f.endswith('.jpg')]), days)
+        rendered = set(rendered)
+        collect_pixel_stats([f for f in image_files if f not in rendered], img_dir, color_dict)
+    if add_cover:
         create_cover(
             script_dir=script_dir,
             size=A4,
             image_files=image_files,
+            color_dict=color_dict,
         )
     print("Finish creating PDF.")
+    return color_dict
@@ -0,0 +1,121 @@
+import os
+import csv
+import shutil
+from argparse import ArgumentTypeError
+from reportlab.lib.pagesizes import A4
+
+from fetch_metadata import FIELDNAMES
+from image_to_pdf import batch_index, load_fonts, save_pixel_stats, load_pixel_stats, create_cover
+
+
+def parse_shard(text):
+    """
+    `i/N` -> (i, N), shards are numbered from 1.
+    """
+    parts = text.split("/")
+    if len(parts) != 2 or not all(part.isdigit() for part in parts) or not 1 <= int(parts[0]) <= int(parts[1]):
+        raise ArgumentTypeError(f"Invalid shard {text}, expected i/N with 1 <= i <= N")
+    return int(parts[0]), int(parts[1])
+
+
+def shard_days(latest, batch_size, shard, shards):
+    """
+    Days before latest that belong to the shard. Whole batches are dealt round-robin so each batch PDF is built by one node.
+    """
+    return [day for day in range(1, latest) if batch_index(day, batch_size) % shards == shard - 1]
+
+
+def save_shard_pixel_stats(color_dict):
+    """
+    Colour histogram of the shard's images (as returned by create_pdf), so the cover can be built at merge time
+    without the other shards' images.
+    """
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    save_pixel_stats(os.path.join(script_dir, "pixel_stats.csv"), color_dict)
+
+
+def merge_metadata(script_dir, shard_dirs):
+    csv_path = os.path.join(script_dir, "metadata.csv")
+    rows = {}
+    for directory in [script_dir] + shard_dirs:  # later shards win, e.g. fresher MINTED counts
+        shard_csv = os.path.join(directory, "metadata.csv")
+        if os.path.exists(shard_csv):
+            with open(shard_csv, 'r', newline='', encoding='utf-8') as f:
+                rows.update({int(row['NUM']): row for row in csv.DictReader(f)})
+
+    with open(csv_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDNAMES)
+        writer.writeheader()
+        writer.writerows(rows[num] for num in sorted(rows))
+    print(f"Merged metadata for {len(rows)} days.")
+
+
+def merge_descriptions(script_dir, shard_dirs):
+    description_csv = os.path.join(script_dir, "description.csv")
+    existing_ids = set()
+    if os.path.exists(description_csv):
+        with open(description_csv, "r", newline="") as csvfile:
+            existing_ids = {int(row["filename"]) for row in csv.DictReader(csvfile)}
+
+    merged_ids = set()
+    with open(description_csv, "a", newline="") as csvfile:
+        csv_writer = csv.writer(csvfile)
+        if not existing_ids:
+            csv_writer.writerow(["filename", "analysis"])
+        for directory in shard_dirs:
+            shard_csv = os.path.join(directory, "description.csv")
+            if not os.path.exists(shard_csv):
+                continue
+            shard_ids = set()
+            with open(shard_csv, "r", newline="") as f:
+                for row in csv.DictReader(f):
+                    image_id = int(row["filename"])
+                    if image_id not in existing_ids:
+                        csv_writer.writerow([image_id, row["analysis"]])
+                        shard_ids.add(image_id)
+            existing_ids |= shard_ids  # shards may overlap, e.g. clones that already had some descriptions
+            merged_ids |= shard_ids
+    print(f"Merged descriptions for {len(merged_ids)} days.")  # description store gets rebuilt on next load
+
+
+def merge_pdfs(script_dir, shard_dirs):
+    pdf_dir = os.path.join(script_dir, "pdf")
+    os.makedirs(pdf_dir, exist_ok=True)  # Create pdf directory if needed
+    for directory in shard_dirs:
+        shard_pdf_dir = os.path.join(directory, "pdf")
+        if not os.path.exists(shard_pdf_dir):
+            continue
+        for pdf_file in sorted(os.listdir(shard_pdf_dir)):
+            if pdf_file.endswith(".pdf") and not os.path.exists(os.path.join(pdf_dir, pdf_file)):
+                shutil.copy2(os.path.join(shard_pdf_dir, pdf_file), pdf_dir)
+                print(f"Copied {pdf_file} from {directory}")
+
+
+def check_shard_dirs(shard_dirs, add_cover=False):
+    required = ["pixel_stats.csv", "images"] if add_cover else []  # everything else is merged only if present
+    for directory in shard_dirs:
+        if not os.path.isdir(directory):
+            raise ValueError(f"Shard directory {directory} not found")
+        missing = [name for name in required if not os.path.exists(os.path.join(directory, name))]
+        if missing:
+            raise ValueError(f"Shard directory {directory} is missing {', '.join(missing)}, needed for the cover")
+
+
+def merge_shards(shard_dirs, add_cover=False):
+    """
+    Combine the output of `create_archive.py --shard i/N` runs (one directory per shard) into this directory.
+    """
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    shard_dirs = [d for d in shard_dirs if os.path.abspath(d) != script_dir]
+    check_shard_dirs(shard_dirs, add_cover)  # before merging anything
+    merge_metadata(script_dir, shard_dirs)
+    merge_descriptions(script_dir, shard_dirs)
+    merge_pdfs(script_dir, shard_dirs)
+    if add_cover:
+        color_dict, image_files = None, set()
+        for directory in shard_dirs:
+            color_dict = load_pixel_stats(os.path.join(directory, "pixel_stats.csv"), color_dict)
+            image_files.update(f for f in os.listdir(os.path.join(directory, "images")) if f.endswith('.jpg'))
+        load_fonts()
+        create_cover(script_dir, A4, sorted(image_files), color_dict)
+    print("Finished merging shards.")
@@ -0,0 +1,113 @@
+import gc
+import reportlab
+from reportlab.pdfgen import canvas
+from reportlab.pdfbase import pdfdoc
+
+REPORTLAB_VERSION = "5.0.1"  # the save path below mirrors PDFDocument internals of this version
+
+
+class WrittenObject(pdfdoc.PDFObject):
+    """
+    Stands in for an object already written to disk, so it can still be referenced (and images reused) by name.
+    Images keep their size, which drawImage needs when reusing them.
+    """
+    def __init__(self, obj):
+        self.width = getattr(obj, "width", None)
+        self.height = getattr(obj, "height", None)
+
+    def format(self, document):
+        raise ValueError("object was already written to disk")
+
+
+class StreamingPDFDocument(pdfdoc.PDFDocument):
+    """
+    PDFDocument that writes finished objects (pages, their streams, images...) to disk as soon as flush() is called,
+    instead of keeping all of them in memory until save. Fonts, the page tree and the catalog are written last, once.
+    """
+    def __init__(self, filename, **kwargs):
+        if reportlab.Version != REPORTLAB_VERSION:
+            raise RuntimeError(f"Streaming PDFs need reportlab {REPORTLAB_VERSION} (found {reportlab.Version}), see requirements.txt")
+        super().__init__(filename=filename, **kwargs)
+        self._file = open(filename, "wb")
+        self._offset = 0
+        self._checked = 0  # last object number either written or deferred
+        self._deferred = []
+        self._final = False
+        self._write(pdfdoc.PDFFile(self._pdfVersion).format(self))  # just the header
+
+    def _write(self, data):
+        offset = self._offset
+        self._file.write(data)
+        self._offset += len(data)
+        return offset
+
+    def _write_object(self, name):
+        obj = self.idToObject[name]
+        self.idToOffset[name] = self._write(pdfdoc.PDFIndirectObject(name, obj).format(self))
+        self.idToObject[name] = WrittenObject(obj)
+
+    def _still_growing(self, name):
+        obj = self.idToObject[name]
+        return name == pdfdoc.BasicFonts or any(obj is o for o in (self.Pages, self.Catalog, self.info, self.Outlines))
+
+    def flush(self):
+        # writing an object may register new ones (e.g. page streams), so keep going until there are none left
+        while self._checked + 1 in self.numberToId:
+            self._checked += 1
+            name = self.numberToId[self._checked]
+            if not self._final and self._still_growing(name):
+                self._deferred.append(name)
+            else:
+                self._write_object(name)
+        self.Pages.pages = [self.Reference(page) for page in self.Pages.pages]  # references instead of page objects
+
+    def SaveToFile(self, filename, canvas):
+        if self._final:
+            raise RuntimeError("class %s instances can only be saved once" % self.__class__.__name__)
+        self._final = True
+        self.encrypt.prepare(self)
+        for fnt in self.delayedFonts:  # same preparation as GetPDFData, but objects are written as they go
+            fnt.addObjects(self)
+        self.info.invariant = self.invariant
+        self.info.digest(self.signature)
+        self.Reference(self.Catalog)
+        self.Reference(self.info)
+        self.Outlines.prepare(self, canvas)
+        if self.Outlines.ready < 0:
+            self.Catalog.Outlines = None
+
+        self.flush()
+        while self._deferred:
+            self._write_object(self._deferred.pop(0))
+            self.flush()
+
+        count = len(self.numberToId)
+        xref = pdfdoc.PDFCrossReferenceTable()
+        xref.addsection(0, [self.numberToId[number] for number in range(1, count + 1)])
+        xref_offset = self._write(xref.format(self))
+        trailer = pdfdoc.PDFTrailer(
+            startxref=xref_offset,
+            Size=count + 1,
+            Root=self.Reference(self.Catalog),
+            Info=self.Reference(self.info),
+            ID=self.ID(),
+        )
+        self._write(trailer.format(self))
+        self._file.close()
+
+
+class StreamingCanvas(canvas.Canvas):
+    """
+    Canvas with flat memory usage: call flush() after each page (or group of pages) to write it to disk.
+    """
+    def __init__(self, filename, lang=None, encrypt=None, **kwargs):
+        if encrypt:  # objects are written before the document ID (and so the encryption key) is final
+            raise ValueError("Streaming PDFs can't be encrypted")
+        super().__init__(filename, lang=lang, **kwargs)
+        doc = self._doc
+        self._doc = StreamingPDFDocument(filename, compression=doc.compression, invariant=doc.invariant, pdfVersion=doc._pdfVersion, lang=lang)
+        self._make_preamble()  # registers the initial font (/F1) in the new document, the old one is discarded
+
+    def flush(self):
+        self._doc.flush()
+        gc.collect()  # ImageReader keeps a reference cycle (jpeg_fh), so decoded images wait for a full collection otherwise
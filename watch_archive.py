@@ -0,0 +1,124 @@
+import os
+from bisect import insort
+from collections import defaultdict
+from time import sleep
+from reportlab.lib.pagesizes import A4
+
+from config import WATCH_INTERVAL, BASEPAINT_API_URL, BASEPAINT_ANIMATIONS_URL
+from fetch_files import fetch_file
+from fetch_metadata import load_titles, title_entry, fetch_day_data, fetch_metadata_row, append_metadata_row
+from image_descriptions import create_model, reduce_image, describe_png_images_to_csv
+from description_store import load_description_store
+from image_to_pdf import load_fonts, add_pixel_stats, collect_pixel_stats, batch_index, batch_pdf_path, create_batch_pdf, create_cover
+
+
+def load_archive_state(script_dir, add_cover, include_description):
+    """
+    Everything a cron run rebuilds from disk, loaded once and kept in memory between days.
+    """
+    image_dir = os.path.join(script_dir, "images")
+    image_files = sorted([f for f in os.listdir(image_dir) if f.endswith('.jpg')])
+    state = {
+        "titles": load_titles(os.path.join(script_dir, "metadata.csv")),
+        "image_files": image_files,
+        "descriptions": defaultdict(list),
+        "color_dict": collect_pixel_stats(image_files, image_dir) if add_cover else None,
+        "model": None,  # Gemini model is only created once a description is needed
+    }
+    if include_description:
+        state["descriptions"] = load_description_store(script_dir)
+    return state
+
+
+def update_metadata(state, script_dir, day, data=None, api_url=BASEPAINT_API_URL):
+    if day in state["titles"]:
+        return
+    try:
+        metadata = fetch_metadata_row(day, api_url, data)
+        state["titles"][day] = title_entry(metadata)
+        append_metadata_row(os.path.join(script_dir, "metadata.csv"), metadata)
+    except Exception as e:
+        print(f"Error processing Day {day}: {str(e)}")
+
+
+def describe_day(state, script_dir, day, image_path):
+    reduced_dir = os.path.join(script_dir, "reduced_images")
+    os.makedirs(reduced_dir, exist_ok=True)
+    reduced_img = os.path.join(reduced_dir, f"{day:04d}.png")
+    if not os.path.exists(reduced_img):
+        reduce_image(image_path, reduced_img)
+    if state["model"] is None:
+        state["model"] = create_model()
+
+    metadata_days = {day: state["titles"].get(day, {}).get("title", "")}
+    entries = describe_png_images_to_csv(metadata_days, script_dir, model=state["model"], days=[day]).get(day)
+    if entries:
+        state["descriptions"][day] = [entry for entry in entries if 'no_coords' not in entry['flags']]
+
+
+def update_batch_pdf(state, script_dir, image_file, batch_size, include_video, include_description, exclude_images, include_description_image, include_description_image_grid):
+    pdf_dir = os.path.join(script_dir, "pdf")
+    os.makedirs(pdf_dir, exist_ok=True)  # Create pdf directory if needed
+
+    day = int(image_file.split('.')[0])
+    output_pdf = batch_pdf_path(pdf_dir, day, batch_size)
+    batch_files = [f for f in state["image_files"] if batch_index(int(f.split('.')[0]), batch_size) == batch_index(day, batch_size)]
+    if len(batch_files) < batch_size:  # same rule as a full run, which would skip a partial PDF for good once it exists
+        print(f"Skipping {output_pdf} until all its days are available")
+        return
+
+    create_batch_pdf(output_pdf, script_dir, state["titles"], batch_files, state["descriptions"],
+                     include_video=include_video, include_description=include_description, exclude_images=exclude_images,
+                     include_description_image=include_description_image, include_description_image_grid=include_description_image_grid)
+
+
+def archive_day(state, script_dir, day, next_day_data, batch_size=100, add_cover=False, include_video=False, include_description=False, exclude_images=False, include_description_image=False, include_description_image_grid=False, api_url=BASEPAINT_API_URL, animations_url=BASEPAINT_ANIMATIONS_URL):
+    """
+    Incremental equivalent of a full run with LATEST bumped by one: only `day` is fetched, described and rendered.
+    Returns False if the image could not be fetched, so the caller can retry later.
+    """
+    update_metadata(state, script_dir, day, api_url=api_url)
+    update_metadata(state, script_dir, day + 1, next_day_data, api_url)  # metadata runs one day ahead of images
+
+    image_path = fetch_file(day, "images", api_url, animations_url)
+    if image_path is None:
+        return False
+    image_file = os.path.basename(image_path)
+    if image_file not in state["image_files"]:
+        insort(state["image_files"], image_file)
+        if state["color_dict"] is not None:
+            add_pixel_stats(state["color_dict"], image_path)
+    if include_video:
+        fetch_file(day, "videos", api_url, animations_url)
+    if include_description and day not in state["descriptions"]:
+        describe_day(state, script_dir, day, image_path)
+
+    update_batch_pdf(state, script_dir, image_file, batch_size, include_video, include_description, exclude_images, include_description_image, include_description_image_grid)
+    if add_cover:
+        create_cover(script_dir, A4, state["image_files"], state["color_dict"])
+    return True
+
+
+def watch_archive(latest, batch_size=100, add_cover=False, include_video=False, include_description=False, exclude_images=False, include_description_image=False, include_description_image_grid=False, interval=WATCH_INTERVAL, api_url=BASEPAINT_API_URL, animations_url=BASEPAINT_ANIMATIONS_URL):
+    """
+    Keep running and archive each new day as soon as the following one starts (i.e. day LATEST once LATEST+1 exists).
+    Fonts, titles, descriptions, pixel stats and file lists are loaded once instead of on every run.
+    """
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    load_fonts()
+    state = load_archive_state(script_dir, add_cover, include_description)
+    print(f"Watching {api_url} for day {latest + 1}...")
+    while True:
+        try:
+            next_day_data = fetch_day_data(latest + 1, api_url)
+        except Exception as e:  # not started yet (404) or endpoint unreachable
+            print(f"Day {latest + 1} not available yet ({e}). Sleeping {interval} secs.")
+            sleep(interval)
+            continue
+
+        print(f"Day {latest + 1} started. Archiving day {latest}...")
+        if archive_day(state, script_dir, latest, next_day_data, batch_size, add_cover, include_video, include_description, exclude_images, include_description_image, include_description_image_grid, api_url, animations_url):
+            latest += 1
+            print(f"Finished archiving day {latest - 1}.")
+        else:
+            sleep(interval)